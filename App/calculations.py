@@ -1,105 +1,363 @@
-﻿from typing import Callable
+﻿from typing import Callable, Optional
 import numpy as np
+import os
 import random as rd
+import threading
 
+from kernels import get_fused_kernel
 
-def calculate_darboux_sums(points:list[float], func: Callable):
-    lower_sum: float = 0
-    upper_sum: float = 0
-    max_s: float = 0
-    aux_max: float = 0
-    lower_area:float = 0
-    upper_area:float = 0
-    details: dict[str, float] = {}
-
-    # Para cada subintervalo en la partición
-    for i in range(len(points) - 1):
-        # Límites del subintervalo
-        a: float = points[i]       
-        b: float = points[i+1]     
-        delta_x:float = b - a
-        
-        # Indice del puntos inicial del mayor subintervalo
-        if delta_x > aux_max:
-            aux_max = delta_x
-            max_s = i
-        
-        # Puntos para la aproximacion 
-        x_values = np.linspace(a, b, 100)
-        y_values = func(x_values)
-
-        # Máximo y mínimo de la función en el subintervalo
-        min_val:float = np.min(y_values)
-        max_val:float = np.max(y_values)
-        
-        # Calcular área para este subintervalo
-        lower_area = min_val * delta_x
-        upper_area = max_val * delta_x
-
-        # Acumular sumas
-        lower_sum += lower_area
-        upper_sum += upper_area
-
-    # Guardar detalles de este subintervalo para visualización posterior
+
+# Puntos de muestreo denso para los subintervalos de funciones sin puntos
+# críticos conocidos
+SAMPLES_PER_INTERVAL: int = 100
+# Sumas de Riemann que se calculan junto a las de Darboux
+RIEMANN_SUMS: tuple[str, ...] = ('left_sum', 'right_sum', 'midpoint_sum', 'trapezoid_sum', 'simpson_sum')
+# Particiones equidistantes (n, 2n, 4n, ...) que usa la extrapolación de Romberg
+EXTRAPOLATION_LEVELS: int = 4
+# Usar el núcleo compilado con Numba para el muestreo denso, si está disponible
+# (desactivado por defecto: la compilación tarda y el núcleo paralelo no
+# admite llamadas concurrentes desde varios hilos). Se activa con la variable
+# de entorno DARBOUX_JIT=1, con la opción --jit del servidor o desde la interfaz
+USE_JIT: bool = os.environ.get("DARBOUX_JIT", "0").lower() in ("1", "true", "yes")
+# Factor con el que se agrandan, al elegir qué refinar, los subintervalos
+# que contienen una discontinuidad conocida
+DISCONTINUITY_WEIGHT: float = 4.0
+
+
+def evaluate(func: Callable, x: np.ndarray) -> np.ndarray:
+    """Evaluar la función y garantizar un arreglo con la forma de x."""
+    return np.broadcast_to(np.asarray(func(x), dtype=float), x.shape)
+
+
+def make_point_index(points) -> np.ndarray:
+    # Índice ordenado y sin repeticiones de puntos conocidos de la función
+    # (discontinuidades o puntos críticos)
+    return np.unique(np.asarray(points, dtype=float))
+
+
+def _index_counts(left: np.ndarray, right: np.ndarray, index: np.ndarray):
+    # Primer punto del índice y cantidad de ellos en cada [left[i], right[i]],
+    # por búsqueda binaria
+    first = np.searchsorted(index, left, side='left')
+    return first, np.searchsorted(index, right, side='right') - first
+
+
+def _jump_bounds(left: np.ndarray, right: np.ndarray, func: Callable,
+                 critical_points: Optional[np.ndarray], discontinuities: np.ndarray):
+    """
+    Mínimo y máximo de la función en subintervalos que contienen al menos una
+    discontinuidad. Cada subintervalo se corta en sus discontinuidades; en
+    cada trozo la función es suave y sus extremos toman los límites laterales,
+    a los que se suman los valores en las propias discontinuidades.
+    """
+    m = len(left)
+    first, counts = _index_counts(left, right, discontinuities)
+    owner = np.repeat(np.arange(m), counts)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    breaks = discontinuities[first[owner] + offsets]
+    break_values = evaluate(func, breaks)
+
+    # Cortes de cada subintervalo: su extremo izquierdo, sus discontinuidades y su extremo derecho
+    sizes = counts + 2
+    starts = np.cumsum(sizes) - sizes
+    cuts = np.empty(int(np.sum(sizes)))
+    is_break = np.zeros(len(cuts), dtype=bool)
+    cuts[starts] = left
+    cuts[starts + sizes - 1] = right
+    cuts[starts[owner] + 1 + offsets] = breaks
+    is_break[starts[owner] + 1 + offsets] = True
+    cut_owner = np.repeat(np.arange(m), sizes)
+
+    # Trozos entre cortes consecutivos del mismo subintervalo; los límites
+    # laterales se evalúan en el número de punto flotante contiguo
+    piece_left, piece_right = cuts[:-1], cuts[1:]
+    valid = (cut_owner[:-1] == cut_owner[1:]) & (piece_right > piece_left)
+    x_left = np.where(is_break[:-1], np.nextafter(piece_left, piece_right), piece_left)[valid]
+    x_right = np.where(is_break[1:], np.nextafter(piece_right, piece_left), piece_right)[valid]
+    piece_owner = cut_owner[:-1][valid]
+
+    piece_min, piece_max, _ = interval_bounds(
+        x_left, x_right, evaluate(func, x_left), evaluate(func, x_right), func, critical_points
+    )
+
+    # Reunir los trozos y las discontinuidades de cada subintervalo
+    piece_starts = np.searchsorted(piece_owner, np.arange(m))
+    break_starts = np.cumsum(counts) - counts
+    min_vals = np.minimum(np.minimum.reduceat(piece_min, piece_starts), np.minimum.reduceat(break_values, break_starts))
+    max_vals = np.maximum(np.maximum.reduceat(piece_max, piece_starts), np.maximum.reduceat(break_values, break_starts))
+    return min_vals, max_vals
+
+
+def interval_bounds(left: np.ndarray, right: np.ndarray,
+                     f_left: np.ndarray, f_right: np.ndarray,
+                     func: Callable, critical_points: Optional[np.ndarray] = None,
+                     discontinuities: Optional[np.ndarray] = None):
+    """
+    Mínimo, máximo y valor en el punto medio de la función en cada
+    subintervalo [left[i], right[i]].
+
+    Los valores en los extremos se reciben ya calculados (se comparten entre
+    subintervalos vecinos). Si se conoce el índice critical_points de los
+    puntos críticos de la función, sus extremos solo pueden estar en los
+    extremos del subintervalo o en esos puntos y no hace falta muestrear; si
+    no, cada subintervalo se muestrea densamente. Los subintervalos que
+    contienen una discontinuidad del índice discontinuities se tratan por
+    trozos.
+    """
+    if discontinuities is not None and len(discontinuities) and len(left):
+        _, counts = _index_counts(left, right, discontinuities)
+        jumps = counts > 0
+        if np.any(jumps):
+            smooth = ~jumps
+            min_vals = np.empty(len(left))
+            max_vals = np.empty(len(left))
+            mid_values = np.empty(len(left))
+            min_vals[smooth], max_vals[smooth], mid_values[smooth] = interval_bounds(
+                left[smooth], right[smooth], f_left[smooth], f_right[smooth], func, critical_points
+            )
+            min_vals[jumps], max_vals[jumps] = _jump_bounds(
+                left[jumps], right[jumps], func, critical_points, discontinuities
+            )
+            mid_values[jumps] = evaluate(func, (left[jumps] + right[jumps]) / 2)
+            return min_vals, max_vals, mid_values
+
+    # El punto medio se evalúa siempre: lo usa la suma del punto medio
+    mid_values = evaluate(func, (left + right) / 2)
+    min_vals = np.minimum(np.minimum(f_left, f_right), mid_values)
+    max_vals = np.maximum(np.maximum(f_left, f_right), mid_values)
+    if len(left) == 0:
+        return min_vals, max_vals, mid_values
+
+    if critical_points is not None:
+        # Entre puntos críticos consecutivos la función es monótona: basta
+        # con sumar a los extremos los puntos críticos de cada subintervalo
+        first, counts = _index_counts(left, right, critical_points)
+        owner = np.repeat(np.arange(len(left)), counts)
+        offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        critical_values = evaluate(func, critical_points[first[owner] + offsets])
+        np.minimum.at(min_vals, owner, critical_values)
+        np.maximum.at(max_vals, owner, critical_values)
+        return min_vals, max_vals, mid_values
+
+    # Sin puntos críticos conocidos cualquier subintervalo puede tener un extremo
+    # El núcleo paralelo solo desde el hilo principal; los hilos de
+    # trabajo (por ejemplo los del servidor) usan la variante secuencial
+    parallel = threading.current_thread() is threading.main_thread()
+    kernel = get_fused_kernel(func, parallel) if USE_JIT else None
+    if kernel is not None:
+        dense_min, dense_max = kernel(left, right, SAMPLES_PER_INTERVAL)
+    else:
+        x_values = np.linspace(left, right, SAMPLES_PER_INTERVAL, axis=1)
+        y_values = evaluate(func, x_values)
+        dense_min = np.min(y_values, axis=1)
+        dense_max = np.max(y_values, axis=1)
+    return np.minimum(min_vals, dense_min), np.maximum(max_vals, dense_max), mid_values
+
+
+def refinement_priority(left: np.ndarray, right: np.ndarray,
+                        discontinuities: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Prioridad de refinamiento de cada subintervalo [left[i], right[i]]: su
+    ancho, agrandado DISCONTINUITY_WEIGHT veces si contiene una discontinuidad
+    conocida. Se refina el de mayor prioridad.
+    """
+    widths = right - left
+    if discontinuities is None or len(discontinuities) == 0:
+        return widths
+    _, counts = _index_counts(left, right, discontinuities)
+    return np.where(counts > 0, widths * DISCONTINUITY_WEIGHT, widths)
+
+
+def _refinement_index(x_points: np.ndarray, discontinuities: Optional[np.ndarray] = None) -> int:
+    # Subintervalo a refinar: el de mayor prioridad
+    if len(x_points) < 2:
+        return 0
+    return int(np.argmax(refinement_priority(x_points[:-1], x_points[1:], discontinuities)))
+
+
+def _riemann_sums(widths: np.ndarray, values: np.ndarray, mid_values: np.ndarray) -> dict[str, float]:
+    # Sumas de Riemann a partir de las muestras ya tomadas, sin evaluar de nuevo
+    left_sum = float(np.sum(values[:-1] * widths))
+    right_sum = float(np.sum(values[1:] * widths))
+    midpoint_sum = float(np.sum(mid_values * widths))
+    trapezoid_sum = (left_sum + right_sum) / 2
+    return {
+        'left_sum': left_sum,
+        'right_sum': right_sum,
+        'midpoint_sum': midpoint_sum,
+        'trapezoid_sum': trapezoid_sum,
+        'simpson_sum': (trapezoid_sum + 2 * midpoint_sum) / 3
+    }
+
+
+def calculate_darboux_sums(points: list[float], func: Callable, critical_points: Optional[np.ndarray] = None,
+                           discontinuities: Optional[np.ndarray] = None):
+    x_points = np.asarray(points, dtype=float)
+
+    # Cada punto de la partición se evalúa una sola vez
+    values = evaluate(func, x_points)
+    return _partition_details(points, x_points, values, func, critical_points, discontinuities)
+
+
+def _partition_details(points: list[float], x_points: np.ndarray, values: np.ndarray, func: Callable,
+                       critical_points: Optional[np.ndarray], discontinuities: Optional[np.ndarray]):
+    # Sumas y cotas de una partición cuyos valores en los puntos ya se conocen
+    widths = np.diff(x_points)
+
+    # Máximo, mínimo y punto medio de la función en cada subintervalo
+    min_vals, max_vals, mid_values = interval_bounds(
+        x_points[:-1], x_points[1:], values[:-1], values[1:], func, critical_points, discontinuities
+    )
+
+    # Indice del punto inicial del subintervalo a refinar
+    max_s: int = _refinement_index(x_points, discontinuities)
+
+    # Guardar detalles de la partición para el refinamiento y la visualización
     details = {
-        'lower_sum': lower_sum,
-        'upper_sum': upper_sum,
-        'max_subinterval': max_s
+        'lower_sum': float(np.sum(min_vals * widths)),
+        'upper_sum': float(np.sum(max_vals * widths)),
+        'max_subinterval': max_s,
+        **_riemann_sums(widths, values, mid_values),
+        'values': values.copy(),
+        'interval_min': min_vals,
+        'interval_max': max_vals,
+        'midpoint_values': mid_values
     }
     return points, details
-def calculate_add_point(points: list[float], func: Callable, details: dict[str, float]):
-    ms_index:int = int(details['max_subinterval'])
-    ms_size:float = points[ms_index + 1] - points[ms_index]
 
-    # Calcular el area del intervalo que se va a dividir 
-    x_values = np.linspace(points[ms_index], points[ms_index + 1], 100)
-    y_values = func(x_values)
 
-    min_val:float = np.min(y_values)
-    max_val:float = np.max(y_values)
+def calculate_add_point(points: list[float], func: Callable, details: dict,
+                        critical_points: Optional[np.ndarray] = None, rng: Optional[np.random.Generator] = None,
+                        discontinuities: Optional[np.ndarray] = None):
+    # Sin cotas guardadas no hay nada que reutilizar
+    if 'interval_min' not in details:
+        points, details = calculate_darboux_sums(points, func, critical_points, discontinuities)
 
-    lower_area = min_val * ms_size
-    upper_area = max_val * ms_size
+    ms_index: int = int(details['max_subinterval'])
+    ms_size: float = points[ms_index + 1] - points[ms_index]
+    values: np.ndarray = details['values']
+    min_vals: np.ndarray = details['interval_min']
+    max_vals: np.ndarray = details['interval_max']
+    mid_values: np.ndarray = details['midpoint_values']
 
+    # Quitar el area del intervalo que se va a dividir
+    lower_sum: float = details['lower_sum'] - min_vals[ms_index] * ms_size
+    upper_sum: float = details['upper_sum'] - max_vals[ms_index] * ms_size
 
-    lower_sum: float = details['lower_sum'] - lower_area
-    upper_sum: float = details['upper_sum'] - upper_area
-    max_s: float = 0
-    aux_max: float = 0
-    details: dict[str, float] = {}
-
-    new_point = rd.random() * ms_size + points[ms_index]
+    # Con un generador propio la partición es reproducible
+    u: float = rng.random() if rng is not None else rd.random()
+    new_point = u * ms_size + points[ms_index]
     points.insert(ms_index + 1, new_point)
-    
-    for i in range(len(points) - 1):
-        a: float = points[i]
-        b: float = points[i+1]
-        delta_x:float = b - a
-
-        # Indice del punto inicial del mayor subintervalo
-        if delta_x > aux_max:
-            aux_max = delta_x
-            max_s = i
-         
-        if i!=ms_index and i!=ms_index+1:
-            continue
-         
-    
-        x_values = np.linspace(a, b, 100)
-        y_values = func(x_values)
-    
-        min_val:float = np.min(y_values)
-        max_val:float = np.max(y_values)
-    
-        lower_area = min_val * delta_x
-        upper_area = max_val * delta_x
-    
-        lower_sum += lower_area
-        upper_sum += upper_area
-        
+
+    # Solo se evalúa el punto nuevo; los extremos viejos se reutilizan
+    new_value = evaluate(func, np.array([new_point]))[0]
+    values = np.insert(values, ms_index + 1, new_value)
+
+    # Cotas de los dos subintervalos nuevos
+    left = np.array(points[ms_index:ms_index + 2], dtype=float)
+    right = np.array(points[ms_index + 1:ms_index + 3], dtype=float)
+    new_min, new_max, new_mid = interval_bounds(
+        left, right, values[ms_index:ms_index + 2], values[ms_index + 1:ms_index + 3], func, critical_points,
+        discontinuities
+    )
+    delta_x = right - left
+    lower_sum += float(np.sum(new_min * delta_x))
+    upper_sum += float(np.sum(new_max * delta_x))
+
+    min_vals = np.concatenate([min_vals[:ms_index], new_min, min_vals[ms_index + 1:]])
+    max_vals = np.concatenate([max_vals[:ms_index], new_max, max_vals[ms_index + 1:]])
+    mid_values = np.concatenate([mid_values[:ms_index], new_mid, mid_values[ms_index + 1:]])
+
+    # Indice del punto inicial del subintervalo a refinar
+    widths = np.diff(points)
+    max_s: int = _refinement_index(np.asarray(points, dtype=float), discontinuities)
+
     details = {
         'lower_sum': lower_sum,
         'upper_sum': upper_sum,
-        'max_subinterval': max_s
+        'max_subinterval': max_s,
+        **_riemann_sums(widths, values, mid_values),
+        'values': values,
+        'interval_min': min_vals,
+        'interval_max': max_vals,
+        'midpoint_values': mid_values
+    }
+    return points, details
+
+
+def refine_partition(points: list[float], func: Callable, details: dict, partition_type: str,
+                     critical_points: Optional[np.ndarray] = None, rng: Optional[np.random.Generator] = None,
+                     discontinuities: Optional[np.ndarray] = None):
+    # Partición aleatoria: añadir un punto al mayor subintervalo
+    if partition_type == "random":
+        return calculate_add_point(points, func, details, critical_points, rng, discontinuities)
+
+    # Partición equidistante: duplicar los subintervalos, como pide la
+    # extrapolación de Romberg; los puntos nuevos son los puntos medios, cuyos
+    # valores ya se calcularon para la suma del punto medio
+    if 'midpoint_values' not in details:
+        points, details = calculate_darboux_sums(points, func, critical_points, discontinuities)
+    x_points = np.asarray(points, dtype=float)
+    doubled = np.empty(2 * len(x_points) - 1)
+    doubled[0::2] = x_points
+    doubled[1::2] = (x_points[:-1] + x_points[1:]) / 2
+    values = np.empty(len(doubled))
+    values[0::2] = details['values']
+    values[1::2] = details['midpoint_values']
+    return _partition_details(doubled.tolist(), doubled, values, func, critical_points, discontinuities)
+
+
+def next_partition_size(n_points: int, partition_type: str) -> int:
+    # Número de puntos tras el siguiente refinamiento
+    return n_points + 1 if partition_type == "random" else 2 * n_points - 1
+
+
+def _romberg(sums: np.ndarray):
+    # Tabla de Romberg sobre sumas con pasos h, h/2, h/4, ...: su error tiene
+    # un desarrollo en potencias pares de h; devuelve la estimación de mayor
+    # orden y la del orden anterior
+    table = np.array(sums, dtype=float)
+    previous = table[-1]
+    for k in range(1, len(sums)):
+        previous = table[-1]
+        table = (4**k * table[1:] - table[:-1]) / (4**k - 1)
+    return table[-1], previous
+
+
+def calculate_extrapolation(history: list[dict], levels: int = EXTRAPOLATION_LEVELS,
+                            discontinuities: Optional[np.ndarray] = None):
+    """
+    Extrapolación de Richardson (Romberg) sobre la sucesión de particiones
+    equidistantes. Cada elemento de history tiene 'intervals', 'lower_sum',
+    'upper_sum', 'trapezoid_sum' y 'midpoint_sum'; se usan los últimos
+    elementos (hasta levels de ellos) mientras cada uno duplique los
+    subintervalos del anterior.
+
+    Con discontinuidades conocidas las sumas no tienen un desarrollo en
+    potencias de h: la estimación es el punto medio entre las sumas de
+    Darboux y el error, la mitad de su diferencia.
+    """
+    latest = history[-1]
+    if discontinuities is not None and len(discontinuities):
+        return {
+            'extrapolated': float((latest['lower_sum'] + latest['upper_sum']) / 2),
+            'extrapolation_error': float((latest['upper_sum'] - latest['lower_sum']) / 2)
+        }
+
+    # La cadena se corta en el primer salto que no duplica los subintervalos
+    chain = [latest]
+    for entry in reversed(history[:-1]):
+        if len(chain) == levels or 2 * entry['intervals'] != chain[0]['intervals']:
+            break
+        chain.insert(0, entry)
+
+    trapezoid, trapezoid_prev = _romberg(np.array([entry['trapezoid_sum'] for entry in chain]))
+    midpoint, midpoint_prev = _romberg(np.array([entry['midpoint_sum'] for entry in chain]))
+
+    # El error se estima por el cambio respecto al orden anterior y por la
+    # distancia entre las dos extrapolaciones
+    error = max(abs(trapezoid - trapezoid_prev), abs(midpoint - midpoint_prev), abs(trapezoid - midpoint) / 2)
+    return {
+        'extrapolated': float((trapezoid + midpoint) / 2),
+        'extrapolation_error': float(error)
     }
-    return points, details
\ No newline at end of file
@@ -0,0 +1,148 @@
+﻿from typing import Callable, Optional
+import numpy as np
+import random as rd
+
+
+# Puntos de muestreo por eje en cada celda
+SAMPLES_PER_CELL: int = 8
+# Valores que se evalúan a la vez como máximo, para acotar la memoria
+MAX_BATCH: int = 2_000_000
+
+
+def _cell_bounds(x_points: np.ndarray, y_points: np.ndarray, func: Callable):
+    """
+    Mínimo y máximo de f(x, y) en cada celda de la malla x_points × y_points.
+
+    Las muestras de todas las celdas forman una malla tensorial que se evalúa
+    con una sola llamada vectorizada (por bloques de columnas si es muy grande).
+    """
+    t = np.linspace(0, 1, SAMPLES_PER_CELL)
+    x_samples = x_points[:-1, None] + np.diff(x_points)[:, None] * t
+    y_samples = y_points[:-1, None] + np.diff(y_points)[:, None] * t
+
+    nx, ny = len(x_samples), len(y_samples)
+    min_vals = np.empty((nx, ny))
+    max_vals = np.empty((nx, ny))
+    block = max(1, MAX_BATCH // (ny * SAMPLES_PER_CELL**2))
+    for start in range(0, nx, block):
+        # Ejes: columna de celdas, fila de celdas, muestra en x, muestra en y
+        x_grid = x_samples[start:start + block, None, :, None]
+        y_grid = y_samples[None, :, None, :]
+        shape = np.broadcast_shapes(x_grid.shape, y_grid.shape)
+        z_values = np.broadcast_to(np.asarray(func(x_grid, y_grid), dtype=float), shape)
+        min_vals[start:start + block] = np.min(z_values, axis=(2, 3))
+        max_vals[start:start + block] = np.max(z_values, axis=(2, 3))
+    return min_vals, max_vals
+
+
+def _largest_cell(x_points: np.ndarray, y_points: np.ndarray):
+    # En una malla tensorial la celda mayor está en la columna y la fila más anchas
+    return int(np.argmax(np.diff(x_points))), int(np.argmax(np.diff(y_points)))
+
+
+def calculate_darboux_sums_2d(x_points: list[float], y_points: list[float], func: Callable):
+    x_array = np.asarray(x_points, dtype=float)
+    y_array = np.asarray(y_points, dtype=float)
+
+    # Máximo y mínimo de la función en cada celda
+    min_vals, max_vals = _cell_bounds(x_array, y_array, func)
+    areas = np.outer(np.diff(x_array), np.diff(y_array))
+
+    # Guardar detalles de la malla para el refinamiento y la visualización
+    details = {
+        'lower_sum': float(np.sum(min_vals * areas)),
+        'upper_sum': float(np.sum(max_vals * areas)),
+        'max_cell': _largest_cell(x_array, y_array),
+        'cell_min': min_vals,
+        'cell_max': max_vals
+    }
+    return x_points, y_points, details
+
+
+def calculate_add_point_2d(x_points: list[float], y_points: list[float], func: Callable, details: dict,
+                           rng: Optional[np.random.Generator] = None):
+    # Sin cotas guardadas no hay nada que reutilizar
+    if 'cell_min' not in details:
+        x_points, y_points, details = calculate_darboux_sums_2d(x_points, y_points, func)
+
+    i, j = details['max_cell']
+    dx: float = x_points[i + 1] - x_points[i]
+    dy: float = y_points[j + 1] - y_points[j]
+    min_vals: np.ndarray = details['cell_min']
+    max_vals: np.ndarray = details['cell_max']
+    u: float = rng.random() if rng is not None else rd.random()
+
+    # Dividir la celda mayor por su lado más largo: en una malla tensorial
+    # la nueva línea atraviesa toda la columna (o fila) de la celda
+    split_x = dx >= dy
+    if split_x:
+        x_points.insert(i + 1, x_points[i] + u * dx)
+        strip = np.asarray(x_points[i:i + 3], dtype=float)
+        new_min, new_max = _cell_bounds(strip, np.asarray(y_points, dtype=float), func)
+        old_areas = dx * np.diff(y_points)
+        new_areas = np.outer(np.diff(strip), np.diff(y_points))
+        lower_sum = details['lower_sum'] - np.sum(min_vals[i] * old_areas) + np.sum(new_min * new_areas)
+        upper_sum = details['upper_sum'] - np.sum(max_vals[i] * old_areas) + np.sum(new_max * new_areas)
+        min_vals = np.concatenate([min_vals[:i], new_min, min_vals[i + 1:]], axis=0)
+        max_vals = np.concatenate([max_vals[:i], new_max, max_vals[i + 1:]], axis=0)
+    else:
+        y_points.insert(j + 1, y_points[j] + u * dy)
+        strip = np.asarray(y_points[j:j + 3], dtype=float)
+        new_min, new_max = _cell_bounds(np.asarray(x_points, dtype=float), strip, func)
+        old_areas = np.diff(x_points) * dy
+        new_areas = np.outer(np.diff(x_points), np.diff(strip))
+        lower_sum = details['lower_sum'] - np.sum(min_vals[:, j] * old_areas) + np.sum(new_min * new_areas)
+        upper_sum = details['upper_sum'] - np.sum(max_vals[:, j] * old_areas) + np.sum(new_max * new_areas)
+        min_vals = np.concatenate([min_vals[:, :j], new_min, min_vals[:, j + 1:]], axis=1)
+        max_vals = np.concatenate([max_vals[:, :j], new_max, max_vals[:, j + 1:]], axis=1)
+
+    details = {
+        'lower_sum': float(lower_sum),
+        'upper_sum': float(upper_sum),
+        'max_cell': _largest_cell(np.asarray(x_points), np.asarray(y_points)),
+        'cell_min': min_vals,
+        'cell_max': max_vals
+    }
+    return x_points, y_points, details
+
+
+if __name__ == "__main__":
+    """
+    Calcula y dibuja desde la línea de comandos las sumas de Darboux de una
+    función de dos variables sobre una malla refinada al azar.
+    """
+    import argparse
+    import matplotlib.pyplot as plt
+    from functions import FUNCTIONS_2D
+    from visualization import plot_darboux_sums_2d
+
+    parser = argparse.ArgumentParser(description="Darboux sums of f(x, y) on a tensor grid.")
+    parser.add_argument("--function", default="f(x, y) = x² + y²", choices=list(FUNCTIONS_2D))
+    parser.add_argument("--a", type=float, default=0)
+    parser.add_argument("--b", type=float, default=1)
+    parser.add_argument("--c", type=float, default=0)
+    parser.add_argument("--d", type=float, default=1)
+    parser.add_argument("--cells", type=int, default=10, help="Equidistant cells per axis of the initial grid")
+    parser.add_argument("--refine", type=int, default=0, help="Random refinement steps after the initial grid")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--mode", default="heatmap", choices=["heatmap", "bars"])
+    parser.add_argument("--quantity", default="gap", choices=["lower", "upper", "gap"])
+    parser.add_argument("--output", default=None, help="Save the figure to this file instead of showing it")
+    args = parser.parse_args()
+
+    func = FUNCTIONS_2D[args.function]
+    x_points = np.linspace(args.a, args.b, args.cells + 1).tolist()
+    y_points = np.linspace(args.c, args.d, args.cells + 1).tolist()
+    x_points, y_points, details = calculate_darboux_sums_2d(x_points, y_points, func)
+    rng = np.random.default_rng(args.seed)
+    for _ in range(args.refine):
+        x_points, y_points, details = calculate_add_point_2d(x_points, y_points, func, details, rng)
+
+    plt.style.use('dark_background')
+    figure = plt.figure(figsize=(8, 6))
+    ax = figure.add_subplot(projection='3d' if args.mode == 'bars' else None)
+    plot_darboux_sums_2d(ax, x_points, y_points, details, mode=args.mode, quantity=args.quantity)
+    if args.output:
+        figure.savefig(args.output)
+    else:
+        plt.show()
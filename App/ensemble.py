@@ -0,0 +1,179 @@
+﻿from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Callable, Optional, Union
+import numpy as np
+
+from calculations import evaluate, interval_bounds, refinement_priority, make_point_index
+from functions import FUNCTIONS, CRITICAL_POINTS, DISCONTINUITIES
+
+
+def _resolve(func: Union[str, Callable], critical_points: Optional[np.ndarray],
+             discontinuities: Optional[np.ndarray], a: float, b: float):
+    # Las funciones se pueden indicar por su nombre para enviarlas a otros procesos
+    if isinstance(func, str):
+        points = CRITICAL_POINTS.get(func)
+        breakpoints = DISCONTINUITIES.get(func)
+        return (FUNCTIONS[func],
+                make_point_index(points(a, b)) if points is not None else None,
+                make_point_index(breakpoints(a, b)) if breakpoints is not None else None)
+    return func, critical_points, discontinuities
+
+
+def _ensemble_chunk(func: Union[str, Callable], a: float, b: float, max_points: int, seed: int,
+                    ensemble_size: int, start: int, stop: int, critical_points: Optional[np.ndarray] = None,
+                    discontinuities: Optional[np.ndarray] = None):
+    """
+    Refina a la vez las particiones aleatorias start..stop-1 del conjunto y
+    devuelve la diferencia entre las sumas superior e inferior de cada una
+    (filas) para cada número de puntos (columnas).
+    """
+    func, critical_points, discontinuities = _resolve(func, critical_points, discontinuities, a, b)
+    steps = max_points - 2
+
+    # Un generador independiente por partición: el resultado de cada una solo
+    # depende de la semilla y de su índice, no de cómo se reparta el trabajo
+    members = np.random.SeedSequence(seed).spawn(ensemble_size)[start:stop]
+    uniforms = np.array([np.random.default_rng(member).random(steps) for member in members]).reshape(-1, steps)
+    k = len(members)
+    rows = np.arange(k)
+
+    # Subintervalos de cada partición (filas), sin ordenar: al dividir uno,
+    # su mitad izquierda ocupa su columna y la derecha la primera libre
+    left = np.full((k, max_points - 1), float(a))
+    right = np.full((k, max_points - 1), float(b))
+    f_left = np.empty((k, max_points - 1))
+    f_right = np.empty((k, max_points - 1))
+    widths = np.empty((k, max_points - 1))
+    priority = np.empty((k, max_points - 1))
+    min_vals = np.empty((k, max_points - 1))
+    max_vals = np.empty((k, max_points - 1))
+
+    # Todas las particiones empiezan con los extremos del intervalo
+    f_left[:, 0] = evaluate(func, left[:, 0])
+    f_right[:, 0] = evaluate(func, right[:, 0])
+    widths[:, 0] = b - a
+    priority[:, 0] = refinement_priority(left[:, 0], right[:, 0], discontinuities)
+    min_vals[:, 0], max_vals[:, 0], _ = interval_bounds(
+        left[:, 0], right[:, 0], f_left[:, 0], f_right[:, 0], func, critical_points, discontinuities
+    )
+
+    gaps = np.empty((k, steps + 1))
+    gaps[:, 0] = (max_vals[:, 0] - min_vals[:, 0]) * widths[:, 0]
+
+    for step in range(steps):
+        # Dividir el subintervalo a refinar de cada partición en un punto aleatorio
+        ms_index = np.argmax(priority[:, :step + 1], axis=1)
+        free = step + 1
+        a_split = left[rows, ms_index]
+        b_split = right[rows, ms_index]
+        fa_split = f_left[rows, ms_index]
+        fb_split = f_right[rows, ms_index]
+        old_gap = (max_vals[rows, ms_index] - min_vals[rows, ms_index]) * widths[rows, ms_index]
+
+        new_points = a_split + uniforms[:, step] * widths[rows, ms_index]
+        new_values = evaluate(func, new_points)
+
+        # Cotas de los dos subintervalos nuevos de todas las particiones a la vez
+        new_min, new_max, _ = interval_bounds(
+            np.stack([a_split, new_points], axis=1).ravel(),
+            np.stack([new_points, b_split], axis=1).ravel(),
+            np.stack([fa_split, new_values], axis=1).ravel(),
+            np.stack([new_values, fb_split], axis=1).ravel(),
+            func, critical_points, discontinuities
+        )
+        new_min = new_min.reshape(k, 2)
+        new_max = new_max.reshape(k, 2)
+
+        right[rows, ms_index] = new_points
+        f_right[rows, ms_index] = new_values
+        widths[rows, ms_index] = new_points - a_split
+        priority[rows, ms_index] = refinement_priority(a_split, new_points, discontinuities)
+        min_vals[rows, ms_index] = new_min[:, 0]
+        max_vals[rows, ms_index] = new_max[:, 0]
+
+        left[:, free] = new_points
+        right[:, free] = b_split
+        f_left[:, free] = new_values
+        f_right[:, free] = fb_split
+        widths[:, free] = b_split - new_points
+        priority[:, free] = refinement_priority(new_points, b_split, discontinuities)
+        min_vals[:, free] = new_min[:, 1]
+        max_vals[:, free] = new_max[:, 1]
+
+        # Actualizar la diferencia solo con los subintervalos que cambiaron
+        new_gap = np.sum((new_max - new_min) * np.stack([widths[rows, ms_index], widths[:, free]], axis=1), axis=1)
+        gaps[:, step + 1] = gaps[:, step] - old_gap + new_gap
+
+    return gaps
+
+
+def calculate_ensemble(func: Union[str, Callable], a: float, b: float, max_points: int, ensemble_size: int,
+                       seed: int, critical_points: Optional[np.ndarray] = None, processes: int = 1,
+                       discontinuities: Optional[np.ndarray] = None):
+    """
+    Refina un conjunto de particiones aleatorias reproducibles y resume la
+    dispersión de la diferencia entre las sumas de Darboux en cada paso.
+
+    La partición k del conjunto coincide con la que produce calculate_add_point
+    con el generador np.random.default_rng(np.random.SeedSequence(seed).spawn(ensemble_size)[k]).
+    Con processes > 1 el conjunto se reparte entre procesos (func debe ser
+    entonces el nombre de una función de FUNCTIONS o un objeto serializable)
+    y el resultado es idéntico. Los procesos se crean con "spawn", así que el
+    programa que llama debe proteger su código con if __name__ == "__main__".
+    """
+    if processes > 1:
+        bounds = np.linspace(0, ensemble_size, min(processes, ensemble_size) + 1).astype(int)
+        # Procesos nuevos en lugar de copias (fork) de este: una copia hereda
+        # el estado de los hilos de Numba y el intérprete no termina
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            chunks = [
+                pool.submit(_ensemble_chunk, func, a, b, max_points, seed, ensemble_size, start, stop,
+                            critical_points, discontinuities)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            gaps = np.concatenate([chunk.result() for chunk in chunks])
+    else:
+        gaps = _ensemble_chunk(func, a, b, max_points, seed, ensemble_size, 0, ensemble_size,
+                               critical_points, discontinuities)
+
+    return {
+        'points': np.arange(2, max_points + 1),
+        'gaps': gaps,
+        'gap_mean': np.mean(gaps, axis=0),
+        'gap_std': np.std(gaps, axis=0),
+        'gap_min': np.min(gaps, axis=0),
+        'gap_max': np.max(gaps, axis=0)
+    }
+
+
+if __name__ == "__main__":
+    """
+    Ejecuta un conjunto de particiones aleatorias desde la línea de comandos
+    y muestra la dispersión de la diferencia entre las sumas en cada paso.
+    """
+    import argparse
+    import os
+    import calculations
+
+    parser = argparse.ArgumentParser(description="Seeded ensemble of random Darboux partitions.")
+    parser.add_argument("--function", default="f(x) = sin(x)", choices=list(FUNCTIONS))
+    parser.add_argument("--a", type=float, default=0)
+    parser.add_argument("--b", type=float, default=1)
+    parser.add_argument("--max-points", type=int, default=100)
+    parser.add_argument("--ensemble-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--every", type=int, default=10, help="Print one row every this many points")
+    parser.add_argument("--jit", action="store_true", help="Sample with the Numba kernel (same as DARBOUX_JIT=1)")
+    args = parser.parse_args()
+    if args.jit:
+        # Los procesos nuevos leen la opción del entorno al importar calculations
+        os.environ["DARBOUX_JIT"] = "1"
+        calculations.USE_JIT = True
+
+    result = calculate_ensemble(args.function, args.a, args.b, args.max_points, args.ensemble_size,
+                                args.seed, processes=args.processes)
+    print(f"{'Points':>8} {'Mean gap':>14} {'Std':>14} {'Min':>14} {'Max':>14}")
+    for i in range(0, len(result['points']), args.every):
+        print(f"{result['points'][i]:>8} {result['gap_mean'][i]:>14.8f} {result['gap_std'][i]:>14.8f} "
+              f"{result['gap_min'][i]:>14.8f} {result['gap_max'][i]:>14.8f}")
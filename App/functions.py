@@ -0,0 +1,44 @@
+﻿import numpy as np
+
+# Available functions - easy to modify
+FUNCTIONS = {
+    "f(x) = x²": lambda x: x**2,
+    "f(x) = sin(x)": lambda x: np.sin(x),
+    "f(x) = e^x * sin(x) + x²": lambda x: np.exp(x) * np.sin(x) + x**2,
+    "f(x) = 1/x": lambda x: 1/x,
+    "f(x) = x³ - 2x² + 2": lambda x: x**3 - 2*x**2 + 2,
+    "f(x) = ⌊x⌋": lambda x: np.floor(x),
+    "f(x) = x² if x < 1/2, 1 - x otherwise": lambda x: np.where(x < 0.5, x**2, 1 - x)
+}
+
+# Known critical points (zeros of the derivative) for [a, b]; the functions are
+# monotone between consecutive ones, so their subintervals need no sampling
+CRITICAL_POINTS = {
+    "f(x) = x²": lambda a, b: [0.0],
+    "f(x) = sin(x)": lambda a, b: np.pi / 2 + np.pi * np.arange(np.ceil((a - np.pi / 2) / np.pi),
+                                                                np.floor((b - np.pi / 2) / np.pi) + 1),
+    "f(x) = 1/x": lambda a, b: [],
+    "f(x) = x³ - 2x² + 2": lambda a, b: [0.0, 4 / 3],
+    "f(x) = ⌊x⌋": lambda a, b: [],
+    "f(x) = x² if x < 1/2, 1 - x otherwise": lambda a, b: [0.0]
+}
+
+def _inside(points, a, b):
+    """Keep the points in (a, b]: restricted to [a, b], no function jumps at a."""
+    points = np.asarray(points, dtype=float)
+    return points[(points > a) & (points <= b)]
+
+# Known discontinuities (jumps and poles) inside [a, b]
+DISCONTINUITIES = {
+    "f(x) = 1/x": lambda a, b: _inside([0.0], a, b),
+    "f(x) = ⌊x⌋": lambda a, b: np.arange(np.floor(a) + 1, np.floor(b) + 1),
+    "f(x) = x² if x < 1/2, 1 - x otherwise": lambda a, b: _inside([0.5], a, b)
+}
+
+# Functions of two variables for the tensor-grid sums on [a, b] × [c, d]
+FUNCTIONS_2D = {
+    "f(x, y) = x² + y²": lambda x, y: x**2 + y**2,
+    "f(x, y) = sin(x) * cos(y)": lambda x, y: np.sin(x) * np.cos(y),
+    "f(x, y) = e^-(x² + y²)": lambda x, y: np.exp(-(x**2 + y**2)),
+    "f(x, y) = x * y": lambda x, y: x * y
+}
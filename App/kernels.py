@@ -0,0 +1,100 @@
+from typing import Callable, Optional
+import threading
+import numpy as np
+
+# Numba es opcional: sin él se usa el motor de NumPy
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Si el núcleo compilado se puede usar en esta instalación
+JIT_AVAILABLE: bool = numba is not None
+
+
+# Núcleos ya compilados (o None si la función no se pudo compilar), por
+# función y variante (paralela o no)
+_kernels: dict = {}
+# Núcleos que otro hilo está compilando
+_pending: set = set()
+_lock = threading.Lock()
+
+# Firma del núcleo: se compila al crearlo, sin ejecutarlo
+_SIGNATURE = "UniTuple(float64[:], 2)(float64[:], float64[:], int64)"
+
+
+def _compile_kernel(func: Callable, parallel: bool):
+    # La función se compila para valores escalares; con error_model='numpy'
+    # una división por cero da inf, igual que con arreglos de NumPy
+    scalar_func = numba.njit(error_model='numpy')(func)
+
+    @numba.njit(_SIGNATURE, parallel=parallel, error_model='numpy')
+    def kernel(left, right, samples):
+        n = left.shape[0]
+        min_vals = np.empty(n)
+        max_vals = np.empty(n)
+        # Muestreo, evaluación y reducción en un solo bucle, sin arreglos
+        # intermedios; con parallel los subintervalos se reparten entre hilos
+        for i in numba.prange(n):
+            a = left[i]
+            step = (right[i] - a) / (samples - 1)
+            low = np.inf
+            high = -np.inf
+            for k in range(samples):
+                # Mismos puntos que np.linspace(a, b, samples)
+                x = right[i] if k == samples - 1 else a + k * step
+                y = scalar_func(x)
+                # Un NaN se propaga como en np.min y np.max
+                if y < low or y != y:
+                    low = y
+                if y > high or y != y:
+                    high = y
+            min_vals[i] = low
+            max_vals[i] = high
+        return min_vals, max_vals
+
+    return kernel
+
+
+def get_fused_kernel(func: Callable, parallel: bool = True) -> Optional[Callable]:
+    """
+    Núcleo compilado kernel(left, right, samples) -> (min_vals, max_vals) que
+    calcula el mínimo y el máximo de func sobre samples puntos equidistantes de
+    cada subintervalo [left[i], right[i]].
+
+    El núcleo paralelo solo se debe llamar desde un único hilo a la vez (con
+    la capa de hilos "workqueue" de Numba las llamadas concurrentes terminan
+    el proceso); desde hilos de trabajo se usa parallel=False.
+
+    Devuelve None si Numba no está instalado, si func no se puede compilar o
+    si otro hilo la está compilando todavía; en ese caso se debe usar el motor
+    de NumPy.
+    """
+    if numba is None:
+        return None
+    key = (func, parallel)
+    with _lock:
+        if key in _kernels:
+            return _kernels[key]
+        if key in _pending:
+            return None
+        _pending.add(key)
+
+    try:
+        kernel = _compile_kernel(func, parallel)
+    except Exception:
+        kernel = None
+    with _lock:
+        _kernels[key] = kernel
+        _pending.discard(key)
+    return kernel
+
+
+def precompile(func: Callable, parallel: bool = True):
+    """
+    Compila el núcleo de func en segundo plano, para que el primer paso de
+    la animación no espere a la compilación.
+    """
+    if numba is None:
+        return
+    threading.Thread(target=get_fused_kernel, args=(func, parallel), daemon=True).start()
@@ -0,0 +1,73 @@
+﻿import argparse
+import asyncio
+import time
+
+import aiohttp
+
+
+async def run_client(session, url, config, cancel_after):
+    """
+    Run one refinement over the WebSocket and time its steps.
+
+    :return: Tuple with the number of steps received, the total time and the reason to stop
+    """
+    steps = 0
+    start = time.perf_counter()
+    async with session.ws_connect(url, max_msg_size=0) as ws:
+        await ws.send_json({'type': 'start', **config})
+        async for msg in ws:
+            message = msg.json()
+            if message['type'] == 'step':
+                steps += 1
+                if cancel_after is not None and steps == cancel_after:
+                    await ws.send_json({'type': 'cancel'})
+            else:
+                return steps, time.perf_counter() - start, message.get('reason', message.get('message'))
+    return steps, time.perf_counter() - start, "closed"
+
+
+async def main(args):
+    config = {
+        'function': args.function,
+        'a': args.a,
+        'b': args.b,
+        'partition': args.partition,
+        'max_points': args.max_points,
+        'frames': args.frames
+    }
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            run_client(session, args.url, config, args.cancel_after) for _ in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - start
+
+    total_steps = sum(steps for steps, _, _ in results)
+    durations = sorted(duration for _, duration, _ in results)
+    reasons = {}
+    for _, _, reason in results:
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+    print(f"Clients: {args.clients}")
+    print(f"Steps received: {total_steps} in {elapsed:.2f} s ({total_steps / elapsed:.1f} steps/s)")
+    print(f"Session time: min {durations[0]:.2f} s, median {durations[len(durations) // 2]:.2f} s, "
+          f"max {durations[-1]:.2f} s")
+    print(f"Finished: {reasons}")
+
+
+if __name__ == "__main__":
+    """
+    Prueba de carga del modo servidor.
+    Lanza varios clientes simultáneos contra un servidor local.
+    """
+    parser = argparse.ArgumentParser(description="Load test for the Darboux sums server.")
+    parser.add_argument("--url", default="ws://localhost:8080/ws")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--function", default="f(x) = sin(x)")
+    parser.add_argument("--a", type=float, default=0)
+    parser.add_argument("--b", type=float, default=10)
+    parser.add_argument("--partition", choices=["random", "equidistant"], default="random")
+    parser.add_argument("--max-points", type=int, default=200)
+    parser.add_argument("--frames", action="store_true", help="Also request rendered frames")
+    parser.add_argument("--cancel-after", type=int, default=None, help="Cancel each session after this many steps")
+    asyncio.run(main(parser.parse_args()))
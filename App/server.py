@@ -0,0 +1,362 @@
+﻿import argparse
+import asyncio
+import base64
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aiohttp import web, WSMsgType
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import calculations
+from calculations import (calculate_darboux_sums, refine_partition, calculate_extrapolation,
+                          make_point_index, next_partition_size, RIEMANN_SUMS)
+from functions import FUNCTIONS, CRITICAL_POINTS, DISCONTINUITIES
+from visualization import plot_function_with_darboux_sums
+
+MAX_POINTS = 1000  # Same limit as the desktop application
+QUEUE_SIZE = 4  # Steps computed ahead of a slow client before the session waits
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Interactive Darboux Sums Visualizer</title>
+<style>
+  body { background: #2b2b2b; color: white; font-family: sans-serif; display: flex; gap: 20px; }
+  form { display: flex; flex-direction: column; gap: 8px; min-width: 260px; }
+  img { max-width: 100%; }
+</style>
+</head>
+<body>
+<form id="controls">
+  <h2>Darboux Sums</h2>
+  <select name="function">FUNCTION_OPTIONS</select>
+  <label>a = <input name="a" value="0"></label>
+  <label>b = <input name="b" value="1"></label>
+  <select name="partition">
+    <option value="random">Random</option>
+    <option value="equidistant">Equidistant</option>
+  </select>
+  <label>Maximum Number of Points: <input name="max_points" value="15"></label>
+  <label>Target Error (Equidistant): <input name="target_error" placeholder="e.g. 1e-6"></label>
+  <label>Seed: <input name="seed" placeholder="Optional"></label>
+  <button type="submit">Start Animation</button>
+  <button type="button" id="cancel">Cancel</button>
+  <pre id="results"></pre>
+</form>
+<img id="frame">
+<script>
+  const ws = new WebSocket(`ws://${location.host}/ws`);
+  const form = document.getElementById("controls");
+  form.onsubmit = (event) => {
+    event.preventDefault();
+    const data = Object.fromEntries(new FormData(form));
+    ws.send(JSON.stringify({
+      type: "start", function: data.function, a: data.a, b: data.b,
+      partition: data.partition, max_points: data.max_points,
+      target_error: data.target_error || null, seed: data.seed || null, frames: true
+    }));
+  };
+  document.getElementById("cancel").onclick = () => ws.send(JSON.stringify({type: "cancel"}));
+  ws.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    if (message.type === "step") {
+      const { frame, rectangles, ...sums } = message;
+      document.getElementById("frame").src = "data:image/png;base64," + frame;
+      document.getElementById("results").textContent = JSON.stringify(sums, null, 2);
+    } else {
+      document.getElementById("results").textContent += "\\n" + JSON.stringify(message);
+    }
+  };
+</script>
+</body>
+</html>
+"""
+
+
+def _finite_list(values):
+    """Convert an array to a JSON-safe list, replacing non-finite values with None."""
+    return [float(v) if math.isfinite(v) else None for v in np.asarray(values, dtype=float)]
+
+
+def _finite(value):
+    """Convert a number to a JSON-safe value."""
+    return float(value) if math.isfinite(value) else None
+
+
+def parse_config(message):
+    """
+    Validate the parameters of a refinement run sent by a client.
+
+    :param message: The decoded 'start' message
+    :return: Dictionary with the validated parameters
+    """
+    name = message.get('function')
+    if name not in FUNCTIONS:
+        raise ValueError(f"Unknown function: {name}")
+
+    a = float(message.get('a', 0))
+    b = float(message.get('b', 1))
+    if not (math.isfinite(a) and math.isfinite(b)):
+        raise ValueError("Bounds must be finite numbers")
+    if a >= b:
+        raise ValueError("Upper bound must be greater than lower bound")
+
+    max_points = min(int(message.get('max_points', 15)), MAX_POINTS)
+    if max_points < 2:
+        raise ValueError("Maximum points must be at least 2")
+
+    partition_type = message.get('partition', 'random')
+    if partition_type not in ('random', 'equidistant'):
+        raise ValueError(f"Unknown partition type: {partition_type}")
+
+    target_error = message.get('target_error')
+    target_error = float(target_error) if target_error not in (None, '') else None
+    if target_error is not None and target_error <= 0:
+        raise ValueError("Target error must be positive")
+
+    seed = message.get('seed')
+    seed = int(seed) if seed not in (None, '') else None
+
+    return {
+        'function': name,
+        'a': a,
+        'b': b,
+        'max_points': max_points,
+        'partition_type': partition_type,
+        'target_error': target_error,
+        'seed': seed,
+        'frames': bool(message.get('frames', False))
+    }
+
+
+class RefinementRun:
+    """Headless counterpart of the animation loop of InteractiveApp."""
+
+    def __init__(self, config):
+        self.config = config
+        self.func = FUNCTIONS[config['function']]
+        critical_points = CRITICAL_POINTS.get(config['function'])
+        self.critical_points = (
+            make_point_index(critical_points(config['a'], config['b'])) if critical_points is not None else None
+        )
+        breakpoints = DISCONTINUITIES.get(config['function'])
+        self.discontinuities = (
+            make_point_index(breakpoints(config['a'], config['b'])) if breakpoints is not None else None
+        )
+        self.points = []
+        self.details = {}
+        self.sum_history = []
+        self.figure = None
+        # Seeded runs draw their random points from a generator of their own
+        seed = config['seed']
+        self.rng = np.random.default_rng(seed) if seed is not None else np.random.default_rng()
+
+    def first_step(self):
+        """Compute the sums for the partition made of the end points."""
+        self.points, self.details = calculate_darboux_sums(
+            [self.config['a'], self.config['b']], self.func, self.critical_points, self.discontinuities
+        )
+        self.after_step()
+        return self.message()
+
+    def step(self):
+        """Add one point to the partition and recompute the sums."""
+        self.points, self.details = refine_partition(
+            self.points, self.func, self.details, self.config['partition_type'], self.critical_points, self.rng,
+            self.discontinuities
+        )
+        self.after_step()
+        return self.message()
+
+    def after_step(self):
+        """Extrapolate the integral along the equidistant sequence."""
+        if self.config['partition_type'] == "equidistant":
+            self.sum_history.append({
+                'intervals': len(self.points) - 1,
+                'lower_sum': self.details['lower_sum'],
+                'upper_sum': self.details['upper_sum'],
+                'trapezoid_sum': self.details['trapezoid_sum'],
+                'midpoint_sum': self.details['midpoint_sum']
+            })
+            self.details.update(calculate_extrapolation(self.sum_history, discontinuities=self.discontinuities))
+
+    def finished(self):
+        """Return the reason to stop the run, or None while it should go on."""
+        if next_partition_size(len(self.points), self.config['partition_type']) > self.config['max_points']:
+            return "max_points"
+        target_error = self.config['target_error']
+        if target_error is not None and self.details.get('extrapolation_error', math.inf) <= target_error:
+            return "target_error"
+        return None
+
+    def message(self):
+        """Build the message streamed to the client for the current step."""
+        message = {
+            'type': 'step',
+            'points': len(self.points),
+            'lower_sum': _finite(self.details['lower_sum']),
+            'upper_sum': _finite(self.details['upper_sum']),
+            **{key: _finite(self.details[key]) for key in RIEMANN_SUMS},
+            'rectangles': {
+                'x': _finite_list(self.points[:-1]),
+                'width': _finite_list(np.diff(self.points)),
+                'min': _finite_list(self.details['interval_min']),
+                'max': _finite_list(self.details['interval_max'])
+            }
+        }
+        if 'extrapolated' in self.details:
+            message['extrapolated'] = _finite(self.details['extrapolated'])
+            message['extrapolation_error'] = _finite(self.details['extrapolation_error'])
+        if self.config['frames']:
+            message['frame'] = self.render()
+        return message
+
+    def render(self):
+        """Render the current step as a base64 encoded PNG image."""
+        if self.figure is None:
+            self.figure = Figure(figsize=(8, 6), facecolor='#2b2b2b')
+            FigureCanvasAgg(self.figure)
+            self.figure.add_subplot()
+        ax = self.figure.axes[0]
+        plot_function_with_darboux_sums(
+            ax,
+            self.func,
+            self.points,
+            self.details['lower_sum'],
+            self.details['upper_sum'],
+            self.details
+        )
+        ax.set_facecolor('#2b2b2b')
+        self.figure.tight_layout()
+
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format='png', facecolor=self.figure.get_facecolor())
+        return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+class Session:
+    """One client connection; runs at most one refinement at a time."""
+
+    def __init__(self, ws, pool):
+        self.ws = ws
+        self.pool = pool
+        self.task = None
+
+    def start(self, config):
+        """Cancel the current run, if any, and start a new one."""
+        self.cancel()
+        self.task = asyncio.create_task(self.run(RefinementRun(config)))
+
+    def cancel(self):
+        """Stop the current run; steps already computing are discarded."""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = None
+
+    async def run(self, refinement):
+        """Compute the steps on the shared pool and stream them to the client."""
+        # The bounded queue makes the producer wait for a slow client
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        producer = asyncio.create_task(self.produce(refinement, queue))
+        try:
+            while True:
+                message = await queue.get()
+                await self.ws.send_json(message)
+                if message['type'] != 'step':
+                    break
+        except asyncio.CancelledError:
+            if not self.ws.closed:
+                await self.ws.send_json({'type': 'done', 'reason': 'cancelled'})
+            raise
+        finally:
+            producer.cancel()
+
+    async def produce(self, refinement, queue):
+        """Run the refinement steps in the worker pool."""
+        loop = asyncio.get_running_loop()
+        try:
+            await queue.put(await loop.run_in_executor(self.pool, refinement.first_step))
+            while (reason := refinement.finished()) is None:
+                await queue.put(await loop.run_in_executor(self.pool, refinement.step))
+            await queue.put({'type': 'done', 'reason': reason})
+        except Exception as e:
+            # Report the failure instead of leaving the client waiting
+            await queue.put({'type': 'error', 'message': str(e)})
+
+
+async def websocket_handler(request):
+    """Handle a client: 'start' launches a run, 'cancel' stops it."""
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    session = Session(ws, request.app['pool'])
+
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                message = msg.json()
+                if not isinstance(message, dict):
+                    raise ValueError("Messages must be JSON objects")
+                if message.get('type') == 'start':
+                    session.start(parse_config(message))
+                elif message.get('type') == 'cancel':
+                    session.cancel()
+                else:
+                    raise ValueError(f"Unknown message type: {message.get('type')}")
+            except (ValueError, TypeError) as e:
+                await ws.send_json({'type': 'error', 'message': f"Invalid input: {str(e)}"})
+    finally:
+        session.cancel()
+    return ws
+
+
+async def index_handler(request):
+    """Serve the browser client."""
+    options = "".join(f"<option>{name}</option>" for name in FUNCTIONS)
+    return web.Response(text=INDEX_HTML.replace("FUNCTION_OPTIONS", options), content_type='text/html')
+
+
+async def functions_handler(request):
+    """List the available functions."""
+    return web.json_response(list(FUNCTIONS))
+
+
+def create_app(workers=None):
+    """
+    Create the server application.
+
+    :param workers: Number of threads of the worker pool shared by all sessions
+    """
+    app = web.Application()
+    app['pool'] = ThreadPoolExecutor(max_workers=workers)
+    app.router.add_get('/', index_handler)
+    app.router.add_get('/functions', functions_handler)
+    app.router.add_get('/ws', websocket_handler)
+
+    async def shutdown_pool(app):
+        app['pool'].shutdown(cancel_futures=True)
+
+    app.on_cleanup.append(shutdown_pool)
+    return app
+
+
+if __name__ == "__main__":
+    """
+    Punto de entrada del modo servidor.
+    Sirve el visualizador por HTTP/WebSocket a varios clientes.
+    """
+    parser = argparse.ArgumentParser(description="Serve the Darboux sums visualizer over HTTP/WebSocket.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="Threads of the shared worker pool")
+    parser.add_argument("--jit", action="store_true", help="Sample with the Numba kernel (same as DARBOUX_JIT=1)")
+    args = parser.parse_args()
+    if args.jit:
+        calculations.USE_JIT = True
+
+    web.run_app(create_app(args.workers), host=args.host, port=args.port)
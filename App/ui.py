@@ -1,9 +1,13 @@
 ﻿import customtkinter as ctk
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from calculations import calculate_darboux_sums, calculate_add_point
-from visualization import plot_function_with_darboux_sums, update_plot
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+import calculations
+from calculations import (calculate_darboux_sums, refine_partition, calculate_extrapolation, make_point_index,
+                          next_partition_size)
+from kernels import precompile, JIT_AVAILABLE
+from functions import FUNCTIONS, CRITICAL_POINTS, DISCONTINUITIES
+from visualization import plot_function_with_darboux_sums, update_plot, SUM_LABELS
 
 class InteractiveApp:
     def __init__(self, root):
@@ -21,6 +25,8 @@ class InteractiveApp:
 
         # Set default values
         self.selected_function = None
+        self.selected_critical_points = None  # Sorted index of known critical points in [a, b]
+        self.selected_discontinuities = None  # Sorted index of known jumps in [a, b]
         self.a_value = 0
         self.b_value = 1
         self.max_points = 15
@@ -29,15 +35,15 @@ class InteractiveApp:
         self.details = {}
         self.animation_running = False
         self.partition_type = "random"  # Default partition type
+        self.comparison = None  # Riemann sum overlaid on the plot
+        self.sum_history = []  # Sums of the equidistant refinement sequence
+        self.target_error = None  # Stop once the extrapolation error is below it
+        self.rng = None  # Seeded generator for reproducible random partitions
 
-        # Available functions - easy to modify
-        self.functions = {
-            "f(x) = x²": lambda x: x**2,
-            "f(x) = sin(x)": lambda x: np.sin(x),
-            "f(x) = e^x * sin(x) + x²": lambda x: np.exp(x) * np.sin(x) + x**2,
-            "f(x) = 1/x": lambda x: 1/x,
-            "f(x) = x³ - 2x² + 2": lambda x: x**3 - 2*x**2 + 2
-        }
+        # Available functions, their known critical points and discontinuities
+        self.functions = dict(FUNCTIONS)
+        self.critical_points = dict(CRITICAL_POINTS)
+        self.discontinuities = dict(DISCONTINUITIES)
 
         # Configure grid layout with proper weights for responsiveness
         self.root.grid_columnconfigure(0, weight=1)
@@ -195,6 +201,17 @@ class InteractiveApp:
         )
         equidistant_radio.grid(row=0, column=1, padx=20, pady=5, sticky="w")
 
+        # Optional seed to reproduce random partitions
+        seed_frame = ctk.CTkFrame(partition_frame, fg_color="transparent")
+        seed_frame.grid(row=2, column=0, padx=5, pady=5, sticky="ew")
+        seed_frame.grid_columnconfigure(1, weight=1)
+
+        ctk.CTkLabel(seed_frame, text="Seed:", font=ctk.CTkFont(size=14)).grid(
+            row=0, column=0, padx=(0, 10), sticky="w")
+        self.seed_entry = ctk.CTkEntry(seed_frame, width=100, font=ctk.CTkFont(size=14),
+                                       placeholder_text="Optional")
+        self.seed_entry.grid(row=0, column=1, sticky="ew")
+
         # Max points setting
         max_points_frame = ctk.CTkFrame(self.scrollable_frame)
         max_points_frame.grid(row=4, column=0, padx=10, pady=5, sticky="ew")
@@ -216,6 +233,22 @@ class InteractiveApp:
         )
         max_points_hint.grid(row=2, column=0, padx=5, pady=(0, 5), sticky="w")
 
+        # Target accuracy for the extrapolated estimate
+        ctk.CTkLabel(max_points_frame, text="Target Error (Equidistant):", font=ctk.CTkFont(size=14)).grid(
+            row=3, column=0, padx=5, pady=(5, 0), sticky="w")
+
+        self.target_error_entry = ctk.CTkEntry(max_points_frame, width=100, font=ctk.CTkFont(size=14),
+                                               placeholder_text="e.g. 1e-6")
+        self.target_error_entry.grid(row=4, column=0, padx=5, pady=5, sticky="ew")
+
+        target_error_hint = ctk.CTkLabel(
+            max_points_frame,
+            text="(Optional: stop when the extrapolation error is below it)",
+            font=ctk.CTkFont(size=12),
+            text_color="gray"
+        )
+        target_error_hint.grid(row=5, column=0, padx=5, pady=(0, 5), sticky="w")
+
         # Animation speed
         speed_frame = ctk.CTkFrame(self.scrollable_frame)
         speed_frame.grid(row=5, column=0, padx=10, pady=5, sticky="ew")
@@ -249,6 +282,15 @@ class InteractiveApp:
         ctk.CTkLabel(speed_labels_frame, text="Fast", font=ctk.CTkFont(size=12), text_color="gray").grid(
             row=0, column=2, sticky="e")
 
+        # Compiled sampling kernel (needs Numba)
+        self.jit_switch = ctk.CTkSwitch(speed_frame, text="Compile with Numba (JIT)", font=ctk.CTkFont(size=14),
+                                        command=self.on_jit_toggle)
+        self.jit_switch.grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        if calculations.USE_JIT and JIT_AVAILABLE:
+            self.jit_switch.select()
+        if not JIT_AVAILABLE:
+            self.jit_switch.configure(state="disabled")
+
         # Buttons frame
         buttons_frame = ctk.CTkFrame(self.scrollable_frame)
         buttons_frame.grid(row=6, column=0, padx=10, pady=5, sticky="ew")
@@ -337,6 +379,58 @@ class InteractiveApp:
                                        anchor="e")
         self.diff_label.grid(row=3, column=1, sticky="e", pady=5)
 
+        # Riemann sums computed from the same samples as the Darboux sums
+        self.sum_labels = {}
+        for row, (key, text) in enumerate(SUM_LABELS.items(), start=4):
+            ctk.CTkLabel(results_display, text=f"{text}:",
+                         font=ctk.CTkFont(size=14, weight="bold"),
+                         anchor="w").grid(row=row, column=0, sticky="w", pady=5)
+
+            self.sum_labels[key] = ctk.CTkLabel(results_display, text="0.000000",
+                                                font=ctk.CTkFont(size=14),
+                                                anchor="e")
+            self.sum_labels[key].grid(row=row, column=1, sticky="e", pady=5)
+
+        # Romberg extrapolation over the equidistant sequence
+        row = 4 + len(SUM_LABELS)
+        ctk.CTkLabel(results_display, text="Extrapolated:",
+                     font=ctk.CTkFont(size=14, weight="bold"),
+                     anchor="w").grid(row=row, column=0, sticky="w", pady=5)
+
+        self.extrapolated_label = ctk.CTkLabel(results_display, text="-",
+                                               font=ctk.CTkFont(size=14),
+                                               text_color="#3a86ff",
+                                               anchor="e")
+        self.extrapolated_label.grid(row=row, column=1, sticky="e", pady=5)
+
+        ctk.CTkLabel(results_display, text="Error Estimate:",
+                     font=ctk.CTkFont(size=14, weight="bold"),
+                     anchor="w").grid(row=row + 1, column=0, sticky="w", pady=5)
+
+        self.extrapolation_error_label = ctk.CTkLabel(results_display, text="-",
+                                                      font=ctk.CTkFont(size=14),
+                                                      anchor="e")
+        self.extrapolation_error_label.grid(row=row + 1, column=1, sticky="e", pady=5)
+
+        # Riemann sum to compare against on the plot
+        comparison_frame = ctk.CTkFrame(self.results_frame, fg_color="transparent")
+        comparison_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="ew")
+        comparison_frame.grid_columnconfigure(1, weight=1)
+
+        ctk.CTkLabel(comparison_frame, text="Compare With:", font=ctk.CTkFont(size=14)).grid(
+            row=0, column=0, padx=(0, 10), sticky="w")
+
+        self.comparison_names = {"None": None, **{text: key for key, text in SUM_LABELS.items()}}
+        self.comparison_var = ctk.StringVar(value="None")
+        self.comparison_menu = ctk.CTkOptionMenu(
+            comparison_frame,
+            values=list(self.comparison_names.keys()),
+            variable=self.comparison_var,
+            command=self.on_comparison_select,
+            font=ctk.CTkFont(size=14)
+        )
+        self.comparison_menu.grid(row=0, column=1, sticky="ew")
+
     def create_graph_panel(self):
         """Create the right panel with the matplotlib graph."""
         # Graph panel frame
@@ -350,12 +444,19 @@ class InteractiveApp:
         self.canvas_widget = self.canvas.get_tk_widget()
         self.canvas_widget.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
 
+        # Toolbar to zoom and pan; the plot re-renders the visible range only
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.graph_frame, pack_toolbar=False)
+        self.toolbar.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="ew")
+
         # Configure tight layout for better responsiveness in the plot
         self.figure.tight_layout()
 
     def on_function_select(self, function_name):
         """Handle function selection."""
         self.selected_function = self.functions[function_name]
+        # Compile the JIT kernel now so the first animation step does not wait for it
+        if calculations.USE_JIT:
+            precompile(self.selected_function)
         # If we're not in an animation, update the preview
         if not self.animation_running and hasattr(self, 'ax'):
             try:
@@ -376,6 +477,30 @@ class InteractiveApp:
             except (ValueError, AttributeError):
                 pass
 
+    def on_comparison_select(self, comparison_name):
+        """Handle selection of the Riemann sum shown on the plot."""
+        self.comparison = self.comparison_names[comparison_name]
+        # Redraw the current partition; the sums are already computed
+        if self.details:
+            update_plot(
+                self.ax,
+                self.selected_function,
+                self.current_points,
+                self.details['lower_sum'],
+                self.details['upper_sum'],
+                self.details,
+                self.comparison
+            )
+            self.figure.tight_layout()
+            self.canvas.draw()
+
+    def on_jit_toggle(self):
+        """Turn the compiled sampling kernel on or off."""
+        calculations.USE_JIT = bool(self.jit_switch.get())
+        # Compile the kernel now so the first animation step does not wait for it
+        if calculations.USE_JIT and self.selected_function is not None:
+            precompile(self.selected_function)
+
     def on_speed_change(self, value):
         """Handle animation speed change."""
         self.animation_speed = int(value)
@@ -388,6 +513,10 @@ class InteractiveApp:
             a = float(self.a_entry.get())
             b = float(self.b_entry.get())
             max_points = int(self.max_points_entry.get())
+            target_error = self.target_error_entry.get().strip()
+            self.target_error = float(target_error) if target_error else None
+            seed = self.seed_entry.get().strip()
+            self.rng = np.random.default_rng(int(seed)) if seed else None
 
             # Enforce maximum point limit
             if max_points > 1000:
@@ -404,6 +533,10 @@ class InteractiveApp:
                 self.show_error("Maximum points must be at least 2")
                 return
 
+            if self.target_error is not None and self.target_error <= 0:
+                self.show_error("Target error must be positive")
+                return
+
             # Start animation
             self.animation_running = True
             self.start_button.configure(state="disabled")
@@ -411,6 +544,8 @@ class InteractiveApp:
             self.a_entry.configure(state="disabled")
             self.b_entry.configure(state="disabled")
             self.max_points_entry.configure(state="disabled")
+            self.target_error_entry.configure(state="disabled")
+            self.seed_entry.configure(state="disabled")
 
             # Store partition type
             self.partition_type = self.partition_var.get()
@@ -419,8 +554,26 @@ class InteractiveApp:
             self.current_points = [a, b]
             self.current_points.sort()
 
+            # Index the known critical points and discontinuities inside the interval
+            critical_points = self.critical_points.get(self.function_var.get())
+            self.selected_critical_points = (
+                make_point_index(critical_points(a, b)) if critical_points is not None else None
+            )
+            breakpoints = self.discontinuities.get(self.function_var.get())
+            self.selected_discontinuities = (
+                make_point_index(breakpoints(a, b)) if breakpoints is not None else None
+            )
+
             # Calculate initial sums
-            self.current_points, self.details = calculate_darboux_sums(self.current_points, self.selected_function)
+            self.current_points, self.details = calculate_darboux_sums(
+                self.current_points,
+                self.selected_function,
+                self.selected_critical_points,
+                self.selected_discontinuities
+            )
+            self.sum_history = []
+            if self.partition_type == "equidistant":
+                self.update_extrapolation()
 
             # Initial plot
             plot_function_with_darboux_sums(
@@ -428,7 +581,9 @@ class InteractiveApp:
                 self.selected_function,
                 self.current_points,
                 self.details['lower_sum'],
-                self.details['upper_sum']
+                self.details['upper_sum'],
+                self.details,
+                self.comparison
             )
             # Use tight layout for proper display
             self.figure.tight_layout()
@@ -438,7 +593,8 @@ class InteractiveApp:
             self.update_results_display()
 
             # Schedule next step
-            if len(self.current_points) < max_points:
+            if (next_partition_size(len(self.current_points), self.partition_type) <= max_points
+                    and not self.target_reached()):
                 self.root.after(self.animation_speed, self.animation_step, max_points)
             else:
                 self.animation_complete()
@@ -451,6 +607,8 @@ class InteractiveApp:
             self.a_entry.configure(state="normal")
             self.b_entry.configure(state="normal")
             self.max_points_entry.configure(state="normal")
+            self.target_error_entry.configure(state="normal")
+            self.seed_entry.configure(state="normal")
 
     def show_error(self, message):
         """Show an error message box with custom styling."""
@@ -494,26 +652,17 @@ class InteractiveApp:
             return
 
         # Add a new point based on partition type
-        if self.partition_type == "random":
-            # Random partition - add point to largest subinterval
-            self.current_points, self.details = calculate_add_point(
-                self.current_points,
-                self.selected_function,
-                self.details
-            )
-        else:
-            # Equidistant partition
-            a = min(self.current_points)
-            b = max(self.current_points)
-            n = len(self.current_points)
-            # Create equidistant points
-            equidistant_points = [a + i * (b - a) / (n) for i in range(n + 1)]
-            self.current_points = equidistant_points
-            # Recalculate the sums
-            self.current_points, self.details = calculate_darboux_sums(
-                self.current_points,
-                self.selected_function
-            )
+        self.current_points, self.details = refine_partition(
+            self.current_points,
+            self.selected_function,
+            self.details,
+            self.partition_type,
+            self.selected_critical_points,
+            self.rng,
+            self.selected_discontinuities
+        )
+        if self.partition_type == "equidistant":
+            self.update_extrapolation()
 
         # Update the plot
         update_plot(
@@ -521,7 +670,9 @@ class InteractiveApp:
             self.selected_function,
             self.current_points,
             self.details['lower_sum'],
-            self.details['upper_sum']
+            self.details['upper_sum'],
+            self.details,
+            self.comparison
         )
         # Ensure tight layout on updates
         self.figure.tight_layout()
@@ -531,11 +682,29 @@ class InteractiveApp:
         self.update_results_display()
 
         # Schedule next step or finish
-        if len(self.current_points) < max_points:
+        if (next_partition_size(len(self.current_points), self.partition_type) <= max_points
+                    and not self.target_reached()):
             self.root.after(self.animation_speed, self.animation_step, max_points)
         else:
             self.animation_complete()
 
+    def update_extrapolation(self):
+        """Record the equidistant sums and extrapolate the integral from the sequence."""
+        self.sum_history.append({
+            'intervals': len(self.current_points) - 1,
+            'lower_sum': self.details['lower_sum'],
+            'upper_sum': self.details['upper_sum'],
+            'trapezoid_sum': self.details['trapezoid_sum'],
+            'midpoint_sum': self.details['midpoint_sum']
+        })
+        self.details.update(calculate_extrapolation(self.sum_history, discontinuities=self.selected_discontinuities))
+
+    def target_reached(self):
+        """Check whether the extrapolated estimate already meets the target error."""
+        if self.target_error is None or 'extrapolation_error' not in self.details:
+            return False
+        return self.details['extrapolation_error'] <= self.target_error
+
     def animation_complete(self):
         """Handle animation completion."""
         self.animation_running = False
@@ -544,6 +713,8 @@ class InteractiveApp:
         self.a_entry.configure(state="normal")
         self.b_entry.configure(state="normal")
         self.max_points_entry.configure(state="normal")
+        self.target_error_entry.configure(state="normal")
+        self.seed_entry.configure(state="normal")
 
     def reset_visualization(self):
         """Reset the visualization."""
@@ -556,6 +727,8 @@ class InteractiveApp:
         self.a_entry.configure(state="normal")
         self.b_entry.configure(state="normal")
         self.max_points_entry.configure(state="normal")
+        self.target_error_entry.configure(state="normal")
+        self.seed_entry.configure(state="normal")
 
         # Clear graph
         self.ax.clear()
@@ -578,12 +751,17 @@ class InteractiveApp:
         # Reset data
         self.current_points = []
         self.details = {}
+        self.sum_history = []
 
         # Reset result labels
         self.points_label.configure(text="0")
         self.lower_sum_label.configure(text="0.000000")
         self.upper_sum_label.configure(text="0.000000")
         self.diff_label.configure(text="0.000000")
+        for label in self.sum_labels.values():
+            label.configure(text="0.000000")
+        self.extrapolated_label.configure(text="-")
+        self.extrapolation_error_label.configure(text="-")
 
     def update_results_display(self):
         """Update the results display with current values."""
@@ -595,4 +773,13 @@ class InteractiveApp:
         self.points_label.configure(text=f"{len(self.current_points)}")
         self.lower_sum_label.configure(text=f"{lower_sum:.6f}")
         self.upper_sum_label.configure(text=f"{upper_sum:.6f}")
-        self.diff_label.configure(text=f"{diff:.6f}")
\ No newline at end of file
+        self.diff_label.configure(text=f"{diff:.6f}")
+        for key, label in self.sum_labels.items():
+            label.configure(text=f"{self.details.get(key, 0):.6f}")
+
+        if 'extrapolated' in self.details:
+            self.extrapolated_label.configure(text=f"{self.details['extrapolated']:.10f}")
+            self.extrapolation_error_label.configure(text=f"{self.details['extrapolation_error']:.2e}")
+        else:
+            self.extrapolated_label.configure(text="-")
+            self.extrapolation_error_label.configure(text="-")
\ No newline at end of file
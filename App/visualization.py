@@ -1,10 +1,184 @@
 ﻿import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection, PolyCollection
 import matplotlib.colors as mcolors
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 import colorsys
 
-def plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum):
+# Display names for the Riemann sums computed alongside the Darboux sums
+SUM_LABELS = {
+    'left_sum': 'Left Sum',
+    'right_sum': 'Right Sum',
+    'midpoint_sum': 'Midpoint Sum',
+    'trapezoid_sum': 'Trapezoid',
+    'simpson_sum': 'Simpson'
+}
+
+# Partition points drawn per pixel of width before the markers and lines are hidden
+MAX_MARKS_PER_PIXEL = 2
+
+# Bars drawn per axis in the 3D view; finer grids are merged into blocks
+MAX_BARS_PER_AXIS = 40
+
+def _bar_verts(left, right, y0, y1):
+    """Build the vertices of many rectangles at once for a PolyCollection."""
+    return np.stack([
+        np.stack([left, y0], axis=1),
+        np.stack([left, y1], axis=1),
+        np.stack([right, y1], axis=1),
+        np.stack([right, y0], axis=1)
+    ], axis=1)
+
+def _merge_cells(points, min_vals, max_vals, axis):
+    """Merge runs of cells along an axis into at most MAX_BARS_PER_AXIS blocks, keeping their min and max."""
+    n = len(points) - 1
+    if n <= MAX_BARS_PER_AXIS:
+        return points, min_vals, max_vals
+    starts = np.unique(np.linspace(0, n, MAX_BARS_PER_AXIS + 1).astype(int))[:-1]
+    edges = points[np.append(starts, n)]
+    return (edges, np.minimum.reduceat(min_vals, starts, axis=axis),
+            np.maximum.reduceat(max_vals, starts, axis=axis))
+
+def _box_faces(x0, x1, y0, y1, z0, z1):
+    """Build the top and side faces of many boxes at once for a Poly3DCollection."""
+    corners = lambda xs, ys, zs: np.stack([np.stack([x, y, z], axis=-1) for x, y, z in zip(xs, ys, zs)], axis=1)
+    faces = [
+        corners((x0, x1, x1, x0), (y0, y0, y1, y1), (z1, z1, z1, z1)),
+        corners((x0, x1, x1, x0), (y0, y0, y0, y0), (z0, z0, z1, z1)),
+        corners((x0, x1, x1, x0), (y1, y1, y1, y1), (z0, z0, z1, z1)),
+        corners((x0, x0, x0, x0), (y0, y1, y1, y0), (z0, z0, z1, z1)),
+        corners((x1, x1, x1, x1), (y0, y1, y1, y0), (z0, z0, z1, z1))
+    ]
+    return np.concatenate(faces)
+
+class DarbouxViewport:
+    """
+    Keep the Darboux sums plot in sync with the visible x-range.
+
+    Only the subintervals inside the view are drawn, merged per pixel column when
+    there are more of them than pixels, and the curve is re-sampled at screen
+    resolution over the view. The visible subintervals are found with a binary
+    search over the partition points, so zooming and panning stay fast for very
+    large partitions.
+    """
+
+    def __init__(self, ax, func, points, min_vals, max_vals, lower_color, upper_color):
+        self.ax = ax
+        self.func = func
+        self.points = np.asarray(points, dtype=float)
+        self.min_vals = np.asarray(min_vals, dtype=float)
+        self.max_vals = np.asarray(max_vals, dtype=float)
+
+        # Upper bars go below the lower ones, as with the original rectangles
+        self.upper_bars = PolyCollection([], facecolors=upper_color, edgecolors=upper_color,
+                                         linewidths=1, label='Upper Sum')
+        self.lower_bars = PolyCollection([], facecolors=lower_color, edgecolors=lower_color,
+                                         linewidths=1, label='Lower Sum')
+        ax.add_collection(self.upper_bars)
+        ax.add_collection(self.lower_bars)
+
+        self.curve, = ax.plot([], [], color='#3a86ff', label='f(x)', linewidth=2.5)
+        self.markers, = ax.plot([], [], 'o', color='#ffd166', markersize=7)
+        self.partition_lines = LineCollection([], colors='gray', linestyles='--', alpha=0.4,
+                                              transform=ax.get_xaxis_transform())
+        ax.add_collection(self.partition_lines)
+
+        ax.callbacks.connect('xlim_changed', self.update)
+
+    def visible_range(self, x_min, x_max):
+        """Return the first and one past the last subinterval that overlap [x_min, x_max]."""
+        start = max(int(np.searchsorted(self.points, x_min, side='right')) - 1, 0)
+        stop = min(int(np.searchsorted(self.points, x_max, side='left')), len(self.points) - 1)
+        return start, max(start, stop)
+
+    def update(self, ax=None):
+        """Redraw the visible part of the plot."""
+        x_min, x_max = self.ax.get_xlim()
+        width = max(int(self.ax.bbox.width), 1)
+        start, stop = self.visible_range(x_min, x_max)
+
+        self.update_bars(start, stop, width)
+        self.update_partition(start, stop, width)
+
+        # Curve sampled at screen resolution over the visible window only
+        x_plot = np.linspace(x_min, x_max, width)
+        self.curve.set_data(x_plot, self.func(x_plot))
+
+    def update_bars(self, start, stop, width):
+        """Draw the rectangles of the visible subintervals."""
+        left = self.points[start:stop]
+        right = self.points[start + 1:stop + 1]
+        min_vals = self.min_vals[start:stop]
+        max_vals = self.max_vals[start:stop]
+
+        # Lower bars cover [0, min] and upper bars [min, max] (mirrored below zero)
+        lower_y0 = np.where(min_vals >= 0, 0, min_vals)
+        middle = np.where(min_vals >= 0, min_vals, np.where(max_vals <= 0, max_vals, 0))
+        upper_y1 = np.where(max_vals <= 0, 0, max_vals)
+        lower_y1 = upper_y0 = middle
+
+        if stop - start > width:
+            # More subintervals than pixels: merge them per pixel column
+            groups = np.unique(np.linspace(0, stop - start, width, endpoint=False).astype(int))
+            right = right[np.append(groups[1:] - 1, stop - start - 1)]
+            left = left[groups]
+            lower_y0 = np.minimum.reduceat(lower_y0, groups)
+            lower_y1 = np.maximum.reduceat(middle, groups)
+            upper_y0 = np.minimum.reduceat(middle, groups)
+            upper_y1 = np.maximum.reduceat(upper_y1, groups)
+
+        self.lower_bars.set_verts(_bar_verts(left, right, lower_y0, lower_y1))
+        self.upper_bars.set_verts(_bar_verts(left, right, upper_y0, upper_y1))
+
+    def update_partition(self, start, stop, width):
+        """Draw the visible partition points, unless they are too dense to tell apart."""
+        visible_points = self.points[start:stop + 1]
+        if len(visible_points) > MAX_MARKS_PER_PIXEL * width:
+            visible_points = visible_points[:0]
+
+        self.markers.set_data(visible_points, np.zeros(len(visible_points)))
+        self.partition_lines.set_segments(
+            np.stack([
+                np.stack([visible_points, np.zeros(len(visible_points))], axis=1),
+                np.stack([visible_points, np.ones(len(visible_points))], axis=1)
+            ], axis=1)
+        )
+
+def plot_riemann_sum(ax, points, details, comparison, color='#ff006e'):
+    """
+    Overlay one of the Riemann sums from the stored samples, without evaluating the function.
+
+    :param ax: Matplotlib axes to plot on
+    :param points: The partition points
+    :param details: Details from the calculations module
+    :param comparison: Key of the sum to draw, one of SUM_LABELS
+    :param color: Color of the overlay
+    """
+    points = np.asarray(points, dtype=float)
+    values = details['values']
+    mid_values = details['midpoint_values']
+    label = SUM_LABELS[comparison]
+
+    if comparison in ('left_sum', 'right_sum', 'midpoint_sum'):
+        heights = {
+            'left_sum': values[:-1],
+            'right_sum': values[1:],
+            'midpoint_sum': mid_values
+        }[comparison]
+        ax.stairs(heights, points, baseline=0, color=color, linewidth=2, label=label)
+    elif comparison == 'trapezoid_sum':
+        ax.plot(points, values, color=color, linewidth=2, label=label)
+    else:
+        # Parabola through both endpoints and the midpoint of every subinterval
+        t = np.linspace(0, 1, 9)
+        a = points[:-1, None]
+        delta_x = np.diff(points)[:, None]
+        fa, fm, fb = values[:-1, None], mid_values[:, None], values[1:, None]
+        x_values = a + delta_x * t
+        y_values = fa * (1 - t) * (1 - 2*t) + 4 * fm * t * (1 - t) + fb * t * (2*t - 1)
+        ax.plot(x_values.ravel(), y_values.ravel(), color=color, linewidth=2, label=label)
+
+def plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum, details=None, comparison=None):
     """
     Create a visualization of a function with its Darboux sums.
     
@@ -13,12 +187,16 @@ def plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum):
     :param points: The partition points
     :param lower_sum: Current lower Darboux sum
     :param upper_sum: Current upper Darboux sum
+    :param details: Optional details from the calculations module; its per-interval
+        bounds are reused instead of sampling the function again
+    :param comparison: Optional key of a Riemann sum in details to overlay and compare
     """
     # Clear the previous plot
     ax.clear()
 
     # Calculate the range for plotting
-    x_min, x_max = min(points), max(points)
+    points = np.asarray(points, dtype=float)
+    x_min, x_max = points[0], points[-1]
     x_padding = 0.05 * (x_max - x_min)
     x_plot = np.linspace(x_min - x_padding, x_max + x_padding, 1000)
 
@@ -31,83 +209,22 @@ def plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum):
     lower_color = '#00C4CC'  
     upper_color = '#2A0944'  
 
-    for i in range(len(points) - 1):
-        a, b = points[i], points[i+1]
-        delta_x = b - a
-
-        x_values = np.linspace(a, b, 100)
+    if details is not None and 'interval_min' in details:
+        min_vals = details['interval_min']
+        max_vals = details['interval_max']
+    else:
+        x_values = np.linspace(points[:-1], points[1:], 100, axis=1)
         y_values = func(x_values)
-        min_val = np.min(y_values)
-        max_val = np.max(y_values)
-
-        if min_val >= 0:
-            upper_rect = Rectangle(
-                (a, 0), delta_x, max_val,
-                alpha=1.0, color=upper_color,
-                edgecolor='black', linewidth=1,
-                label='Upper Sum' if i == 0 else ""
-            )
-            ax.add_patch(upper_rect)
-
-            lower_rect = Rectangle(
-                (a, 0), delta_x, min_val,
-                alpha=1.0, color=lower_color,
-                edgecolor='black', linewidth=1,
-                label='Lower Sum' if i == 0 else ""
-            )
-            ax.add_patch(lower_rect)
-        elif max_val <= 0:
-            lower_rect = Rectangle(
-                (a, 0), delta_x, min_val,
-                alpha=1.0, color=lower_color,
-                edgecolor='black', linewidth=1,
-                label='Lower Sum' if i == 0 else ""
-            )
-            ax.add_patch(lower_rect)
-
-            upper_rect = Rectangle(
-                (a, 0), delta_x, max_val,
-                alpha=1.0, color=upper_color,
-                edgecolor='black', linewidth=1,
-                label='Upper Sum' if i == 0 else ""
-            )
-            ax.add_patch(upper_rect)
-        else:
-            upper_rect_neg = Rectangle(
-                (a, 0), delta_x, max_val if max_val <= 0 else 0,
-                alpha=1.0, color=upper_color,
-                edgecolor='black', linewidth=1,
-                label='Upper Sum' if i == 0 else ""
-            )
-            lower_rect_neg = Rectangle(
-                (a, 0), delta_x, min_val,
-                alpha=1.0, color=lower_color,
-                edgecolor='black', linewidth=1,
-                label='Lower Sum' if i == 0 else ""
-            )
-
-            upper_rect_pos = Rectangle(
-                (a, 0), delta_x, max_val,
-                alpha=1.0, color=upper_color,
-                edgecolor='black', linewidth=1
-            )
-            lower_rect_pos = Rectangle(
-                (a, 0), delta_x, min_val if min_val >= 0 else 0,
-                alpha=1.0, color=lower_color,
-                edgecolor='black', linewidth=1
-            )
-
-            if max_val > 0:
-                ax.add_patch(upper_rect_pos)
-            if min_val < 0:
-                ax.add_patch(lower_rect_neg)
-                ax.add_patch(upper_rect_neg)
-            if min_val >= 0:
-                ax.add_patch(lower_rect_pos)
-
-    ax.plot(x_plot, y_plot, color='#3a86ff', label='f(x)', linewidth=2.5)
-
-    ax.plot(points, [0] * len(points), 'o', color='#ffd166', markersize=7)
+        min_vals = np.min(y_values, axis=1)
+        max_vals = np.max(y_values, axis=1)
+
+    # Rectangles, curve and partition are drawn for the visible range only
+    # and follow zooming and panning
+    ax._darboux_viewport = DarbouxViewport(ax, func, points, min_vals, max_vals, lower_color, upper_color)
+
+    show_comparison = details is not None and comparison in SUM_LABELS and comparison in details
+    if show_comparison:
+        plot_riemann_sum(ax, points, details, comparison)
 
     ax.set_xlim(x_min - x_padding, x_max + x_padding)
     ax.set_ylim(min(0, y_min - y_padding), y_max + y_padding)
@@ -125,6 +242,8 @@ def plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum):
         f'Upper Sum: {upper_sum:.6f}\n'
         f'Difference: {upper_sum - lower_sum:.6f}'
     )
+    if show_comparison:
+        info_text += f'\n{SUM_LABELS[comparison]}: {details[comparison]:.6f}'
 
     text_box = ax.text(
         0.02, 0.95, info_text,
@@ -137,9 +256,6 @@ def plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum):
         fontweight='bold'
     )
 
-    for point in points:
-        ax.axvline(x=point, color='gray', linestyle='--', alpha=0.4)
-
     ax.tick_params(colors='white')
 
     for spine in ax.spines.values():
@@ -147,5 +263,93 @@ def plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum):
 
     ax.grid(True, alpha=0.3, color='gray')
 
-def update_plot(ax, func, points, lower_sum, upper_sum):
-    plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum)
\ No newline at end of file
+def update_plot(ax, func, points, lower_sum, upper_sum, details=None, comparison=None):
+    plot_function_with_darboux_sums(ax, func, points, lower_sum, upper_sum, details, comparison)
+
+def plot_darboux_sums_2d(ax, x_points, y_points, details, mode='heatmap', quantity='gap'):
+    """
+    Create a visualization of the Darboux sums of a function of two variables.
+
+    Every cell is drawn by a single batched collection, so large grids stay fast.
+
+    :param ax: Matplotlib axes to plot on (with a 3D projection for mode='bars')
+    :param x_points: The partition points on the x axis
+    :param y_points: The partition points on the y axis
+    :param details: Details from calculate_darboux_sums_2d
+    :param mode: 'heatmap' for a colored grid, 'bars' for 3D bars
+    :param quantity: Value shown by the heatmap: 'lower', 'upper' or 'gap' (max - min)
+    """
+    ax.clear()
+
+    x_points = np.asarray(x_points, dtype=float)
+    y_points = np.asarray(y_points, dtype=float)
+    min_vals = details['cell_min']
+    max_vals = details['cell_max']
+
+    lower_color = '#00C4CC'
+    upper_color = '#2A0944'
+
+    if mode == 'bars':
+        # Large grids are merged into blocks with the extreme values of their
+        # cells, like DarbouxViewport merges subintervals per pixel
+        x_edges, bar_min, bar_max = _merge_cells(x_points, min_vals, max_vals, axis=0)
+        y_edges, bar_min, bar_max = _merge_cells(y_points, bar_min, bar_max, axis=1)
+
+        # One bar per block for the lower sum and one on top of it up to the
+        # upper sum, all faces in a single collection per color
+        x0, y0 = [grid.ravel() for grid in np.meshgrid(x_edges[:-1], y_edges[:-1], indexing='ij')]
+        x1, y1 = [grid.ravel() for grid in np.meshgrid(x_edges[1:], y_edges[1:], indexing='ij')]
+        zeros = np.zeros(x0.size)
+        ax.add_collection3d(Poly3DCollection(_box_faces(x0, x1, y0, y1, zeros, bar_min.ravel()),
+                                             facecolor=lower_color, edgecolor='#1a1a1a', linewidths=0.2))
+        ax.add_collection3d(Poly3DCollection(_box_faces(x0, x1, y0, y1, bar_min.ravel(), bar_max.ravel()),
+                                             facecolor=upper_color, edgecolor='#1a1a1a', linewidths=0.2,
+                                             alpha=0.6))
+        ax.set_xlim(x_points[0], x_points[-1])
+        ax.set_ylim(y_points[0], y_points[-1])
+        finite = bar_max[np.isfinite(bar_max)]
+        finite_min = bar_min[np.isfinite(bar_min)]
+        if finite.size and finite_min.size:
+            low, high = min(0.0, finite_min.min()), max(0.0, finite.max())
+            ax.set_zlim(low, high if high > low else low + 1)
+        ax.set_zlabel('f(x, y)', color='white', fontsize=12)
+    else:
+        values = {
+            'lower': min_vals,
+            'upper': max_vals,
+            'gap': max_vals - min_vals
+        }[quantity]
+        ax.pcolormesh(x_points, y_points, values.T, cmap='viridis', shading='flat')
+        ax.set_xlim(x_points[0], x_points[-1])
+        ax.set_ylim(y_points[0], y_points[-1])
+
+    ax.set_title('Darboux Sums Visualization', color='white', fontsize=16)
+    ax.set_xlabel('x', color='white', fontsize=12)
+    ax.set_ylabel('y', color='white', fontsize=12)
+
+    lower_sum = details['lower_sum']
+    upper_sum = details['upper_sum']
+    cells_text = f'Cells: {min_vals.size}'
+    if mode == 'bars' and bar_min.size < min_vals.size:
+        cells_text += f' ({bar_min.shape[0]} × {bar_min.shape[1]} blocks)'
+    info_text = (
+        f'{cells_text}\n'
+        f'Lower Sum: {lower_sum:.6f}\n'
+        f'Upper Sum: {upper_sum:.6f}\n'
+        f'Difference: {upper_sum - lower_sum:.6f}'
+    )
+    text_args = dict(
+        transform=ax.transAxes,
+        bbox=dict(facecolor='#2b2b2b', alpha=0.9, boxstyle='round,pad=0.5',
+                  edgecolor='#3a86ff', linewidth=2),
+        color='white',
+        fontsize=10,
+        verticalalignment='top',
+        fontweight='bold'
+    )
+    if mode == 'bars':
+        ax.text2D(0.02, 0.95, info_text, **text_args)
+    else:
+        ax.text(0.02, 0.95, info_text, **text_args)
+
+    ax.tick_params(colors='white')